@@ -1,11 +1,14 @@
 import os
+import asyncio
+import functools
 import random
+import threading
 import streamlit as st
 from dotenv import load_dotenv
-import requests
+import httpx
 import spotipy
-from spotipy.oauth2 import SpotifyClientCredentials, SpotifyOAuth
-from typing import List, Tuple, Dict
+from spotipy.oauth2 import SpotifyClientCredentials
+from typing import List, Optional, Tuple, Dict
 
 # Load environment variables
 load_dotenv()
@@ -24,24 +27,55 @@ spotify = spotipy.Spotify(
     )
 )
 
-# Function to fetch playlist data from Serper API
-def fetch_playlist_data(query: str) -> Dict:
-    headers = {
-        'Authorization': f'Bearer {serperdev_api_key}',
-        'Content-Type': 'application/json'
-    }
-    try:
-        response = requests.get(
-            f'https://google.serper.dev/search?q=&apiKey=3985e8024153834462bacff357bacea200546eff',
-            params={'q': query},
-            headers=headers,
-            timeout=10
-        )
+SERPER_SEARCH_URL = 'https://google.serper.dev/search'
+SERPER_HEADERS = {
+    'Authorization': f'Bearer {serperdev_api_key}',
+    'Content-Type': 'application/json'
+}
+
+# HTTP/2 needs the optional h2 package (httpx[http2]); without it the client falls back to HTTP/1.1
+try:
+    import h2  # noqa: F401
+    SERPER_HTTP2 = True
+except ImportError:
+    SERPER_HTTP2 = False
+
+# One client lives on a background event loop for the whole process, so connections to Serper
+# stay open across searches and Streamlit reruns
+@st.cache_resource
+def _get_serper_client() -> Tuple[asyncio.AbstractEventLoop, httpx.AsyncClient]:
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    client = httpx.AsyncClient(http2=SERPER_HTTP2, timeout=10, headers=SERPER_HEADERS)
+    return loop, client
+
+# Sub-queries are sent concurrently over the shared client
+async def _search_serper_many(client: httpx.AsyncClient, queries: Tuple[str, ...]) -> List[Dict]:
+    responses = await asyncio.gather(*[
+        client.get(SERPER_SEARCH_URL, params={'q': query, 'apiKey': serperdev_api_key})
+        for query in queries
+    ])
+    for response in responses:
         response.raise_for_status()
-        return response.json()
-    except requests.exceptions.RequestException as e:
+    return [response.json() for response in responses]
+
+# Identical searches are served from Streamlit's cache; errors propagate and are not cached
+@st.cache_data(ttl=3600, show_spinner=False)
+def _search_serper(queries: Tuple[str, ...]) -> List[Dict]:
+    loop, client = _get_serper_client()
+    return asyncio.run_coroutine_threadsafe(_search_serper_many(client, queries), loop).result()
+
+# Function to fetch playlist data for several queries from Serper API at once
+def fetch_playlist_data_many(queries: List[str]) -> List[Dict]:
+    try:
+        return _search_serper(tuple(queries))
+    except (httpx.HTTPError, ValueError) as e:  # ValueError: the body wasn't valid JSON
         st.error(f"Error fetching data from Serper: {e}")
-        return {'organic': []}
+        return [{'organic': []} for _ in queries]
+
+# Function to fetch playlist data from Serper API
+def fetch_playlist_data(query: str) -> Dict:
+    return fetch_playlist_data_many([query])[0]
 
 # Function to create playlist based on user query
 def create_playlist(query: str) -> Tuple[str, List[str]]:
@@ -53,24 +87,33 @@ def create_playlist(query: str) -> Tuple[str, List[str]]:
     
     return relevant_songs
 
+# Track lookups by title are memoized in-process; None when Spotify has no match
+@functools.lru_cache(maxsize=1024)
+def _search_track_id(song_title: str) -> Optional[str]:
+    search_results = spotify.search(q=song_title, type='track', limit=1)
+    tracks = search_results['tracks']['items']
+    return tracks[0]['id'] if tracks else None
+
+# Recommendations are cached per (song_title, num_recommendations) so slider moves don't refetch them;
+# errors propagate and are not cached
+@st.cache_data(ttl=600, show_spinner=False)
+def _fetch_recommendations(song_title: str, num_recommendations: int) -> List[Tuple[str, str]]:
+    track_id = _search_track_id(song_title)
+    if track_id is None:
+        return []
+    
+    recommendations = spotify.recommendations(seed_tracks=[track_id], limit=num_recommendations)
+    return [(f"{track['name']} by {track['artists'][0]['name']}", track['id'])
+            for track in recommendations['tracks']]
+
 # Function to recommend similar songs using Spotify
-def recommend_similar_songs(song_title: str, num_recommendations: int) -> List[str]:
+def recommend_similar_songs(song_title: str, num_recommendations: int) -> List[Tuple[str, str]]:
+    """Return (label, track_id) pairs so callers can add the tracks without searching for them again."""
     try:
-        search_results = spotify.search(q=song_title, type='track', limit=1)
-        tracks = search_results['tracks']['items']
-        
-        if not tracks:
-            return ["No similar songs found."]
-        
-        track_id = tracks[0]['id']
-        recommendations = spotify.recommendations(seed_tracks=[track_id], limit=num_recommendations)
-        similar_songs = [f"{track['name']} by {track['artists'][0]['name']}" 
-                         for track in recommendations['tracks']]
-        
-        return similar_songs
+        return _fetch_recommendations(song_title, num_recommendations)
     except Exception as e:
         st.error(f"Error getting recommendations: {e}")
-        return ["Error fetching recommendations."]
+        return []
         
 def generate_playlist(self, user_query: str, user_id: str) -> str:
         """Generate a playlist based on the user's query and create it on Spotify."""
@@ -94,33 +137,32 @@ def generate_playlist(self, user_query: str, user_id: str) -> str:
 def main():
     st.title("ChordCloud's Personalized Playlist Recommender")
 
-    # Input for user's Spotify username
-    user_id = st.text_input("Enter your Spotify user ID:")
+    # Inputs are batched in a form so typing or dragging the slider doesn't rerun the searches
+    with st.form("playlist_form"):
+        # Input for user's Spotify username
+        user_id = st.text_input("Enter your Spotify user ID:")
+
+        # Input for playlist query
+        user_query = st.text_area("Describe the playlist you want (e.g., 'Relaxing music for studying'):") 
 
-    # Input for playlist query
-    user_query = st.text_area("Describe the playlist you want (e.g., 'Relaxing music for studying'):") 
+        # Let the user choose how many recommendations to generate
+        num_recommendations = st.slider("How many songs would you like?", min_value=1, max_value=30, value=5)
+
+        submitted = st.form_submit_button("Generate")
     
-    if user_query:
+    if submitted and user_query:
         relevant_songs = create_playlist(user_query)
 
         if relevant_songs:
-            # Let the user choose how many recommendations to generate
-            num_recommendations = st.slider("How many songs would you like?", min_value=1, max_value=30, value=5)
             # Generate similar songs based on the first song in the playlist
             similar_songs = recommend_similar_songs(relevant_songs[0], num_recommendations)
 
             st.subheader("Recommended Songs:")
-            for i, song in enumerate(similar_songs, 1):
+            if not similar_songs:
+                st.write("No similar songs found.")
+            for i, (song, _track_id) in enumerate(similar_songs, 1):
                 st.write(f"{i}. {song}")
 
-            # Spotify authentication
-            REDIRECT_URI = "https://chordcloud/callback"
-            scope = "playlist-modify-private"
-            sp = spotipy.Spotify(auth_manager=SpotifyOAuth(client_id=spotipy_client_id,
-                                                           client_secret=spotipy_client_secret,
-                                                           redirect_uri=REDIRECT_URI,
-                                                           scope=scope))
-
         
 
 
@@ -1,132 +1,13 @@
-import os
-import spotipy
-from spotipy.oauth2 import SpotifyOAuth
 import streamlit as st
-from dotenv import load_dotenv
-from typing import List
-from llama_index.core import VectorStoreIndex, SimpleDirectoryReader
-from llama_index import groq
-from langchain.embeddings.groq import GroqEmbeddings
-from llama_index.core.agent import ReActAgent
-from llama_index.core.tools import QueryEngineTool, FunctionTool
-from llama_index.core.memory import ChatMemoryBuffer
+from playlist_generator import PlaylistGeneratorWithLlamaIndex
 
-load_dotenv()
+# The generator (index, embeddings, LLM and tools) is built once per process and shared across reruns
+# and sessions; a failed build raises and is retried on the next click instead of being cached
+DATA_PATH = "data/music_data"
 
-# Function to create a Spotify playlist with the recommended songs
-def create_spotify_playlist(user_id: str, playlist_name: str, song_list: List[str]) -> str:
-    """
-    Creates a Spotify playlist and adds the song list to it.
-    
-    :param user_id: Spotify user ID
-    :param playlist_name: Name of the playlist to be created
-    :param song_list: List of song names (and artists) to be added to the playlist
-    :return: The URL of the created playlist
-    """
-    # Authenticate user for Spotify API access (scope: playlist-modify-private)
-    sp = spotipy.Spotify(auth_manager=SpotifyOAuth(
-        client_id=os.getenv("SPOTIPY_CLIENT_ID"),
-        client_secret=os.getenv("SPOTIPY_CLIENT_SECRET"),
-        redirect_uri=os.getenv("SPOTIPY_REDIRECT_URI"),
-        scope="playlist-modify-private"
-    ))
-
-    # Create a new private playlist
-    playlist = sp.user_playlist_create(user_id, playlist_name, public=False)
-    playlist_id = playlist['id']
-
-    # Search for each song and get its URI
-    track_uris = []
-    for song in song_list:
-        search_results = sp.search(q=song, type="track", limit=1)
-        if search_results['tracks']['items']:
-            track_uri = search_results['tracks']['items'][0]['uri']
-            track_uris.append(track_uri)
-
-    # Add tracks to the created playlist
-    if track_uris:
-        sp.playlist_add_items(playlist_id, track_uris)
-
-    # Return the URL of the created playlist
-    return f"Your playlist has been created! [Open Playlist](https://open.spotify.com/playlist/{playlist_id})"
-
-
-class PlaylistGeneratorWithLlamaIndex:
-    def __init__(self, data_path: str):
-        """Initialize with LlamaIndex and Spotify API."""
-        self.data_path = data_path
-        self.sp = spotipy.Spotify(auth_manager=SpotifyOAuth(
-            client_id=os.getenv("SPOTIPY_CLIENT_ID"),
-            client_secret=os.getenv("SPOTIPY_CLIENT_SECRET"),
-            redirect_uri=os.getenv("SPOTIPY_REDIRECT_URI"),
-            scope="playlist-modify-private"
-        ))
-
-        # Load the index with LlamaIndex
-        self.index = self.create_index()
-        
-        # Set up agent for querying the index
-        self.agent = self.create_agent()
-
-    def create_index(self):
-        """Create a new index from documents (no persistence)."""
-        documents = SimpleDirectoryReader(self.data_path).load_data()
-        if not documents:
-            raise ValueError("No documents found in the specified path.")
-        return VectorStoreIndex.from_documents(documents)
-
-    def create_agent(self):
-        """Create an agent with the ability to query the index."""        
-        llm = Groq(model="text-davinci-003", api_key=os.getenv("GROQ_API_KEY"))
-        
-        # Use OpenAI for embeddings via langchain's OpenAIEmbeddings
-        embed_model = GroqEmbeddings(model="text-davinci-003", openai_api_key=os.getenv("GROQ_API_KEY"))
-
-        
-        query_engine = self.index.as_query_engine(llm=llm, embed_model=embed_model, similarity_top_k=3)
-
-        # Basic search tool
-        search_tool = QueryEngineTool(
-            query_engine=query_engine,
-            name="document_search",
-            description="Search through a document corpus to refine song recommendations",
-        )
-
-        # Custom tool to format song recommendations
-        def song_recommendation_function(query: str) -> str:
-            """Fetch Spotify recommendations based on filtered query."""
-            search_results = self.sp.search(q=query, type="track", limit=5)
-            tracks = search_results['tracks']['items']
-            
-            if not tracks:
-                return "No song recommendations found."
-            recommendations = [f"{track['name']} by {track['artists'][0]['name']}" for track in tracks]
-            return "\n".join(recommendations)
-
-        song_recommendation_tool = FunctionTool.from_defaults(
-            fn=song_recommendation_function,
-            name="song_recommendations",
-            description="Fetches song recommendations from Spotify based on the filtered query"
-        )
-
-        # Initialize the agent with tools
-        return ReActAgent.from_tools(
-            [search_tool, song_recommendation_tool],
-            verbose=True,
-            memory=ChatMemoryBuffer.from_defaults(token_limit=4096),
-        )
-
-    def generate_playlist(self, user_query: str, user_id: str) -> str:
-        """Generate a playlist based on the user's query and create it on Spotify."""
-        response = self.agent.chat(user_query)
-        
-        # Get the refined query from the agent's response
-        refined_query = response.response
-        playlist_songs = self.agent.tools[1].fn(refined_query)
-        song_list = playlist_songs.split("\n")
-        playlist_url = create_spotify_playlist(user_id, "Generated Playlist", song_list)
-        
-        return playlist_url
+@st.cache_resource(show_spinner=False)
+def _get_generator(data_path: str) -> PlaylistGeneratorWithLlamaIndex:
+    return PlaylistGeneratorWithLlamaIndex(data_path=data_path)
 
 
 # Streamlit interface
@@ -144,11 +25,12 @@ def main():
             st.error("Please enter both a Spotify user ID and a playlist query.")
             return
         
-        data_path = "data/music_data"  
-        playlist_generator = PlaylistGeneratorWithLlamaIndex(data_path=data_path)
-
         try:
-            playlist_url = playlist_generator.generate_playlist(user_query, user_id)
+            # Only the first click in the process pays for loading the index and building the tools
+            with st.spinner("Loading the music index..."):
+                playlist_generator = _get_generator(DATA_PATH)
+            st.caption("Search query:")
+            playlist_url = playlist_generator.generate_playlist(user_query, user_id, write_stream=st.write_stream)
             st.success("Your personalized playlist has been generated!")
             st.markdown(playlist_url)
         except Exception as e:
@@ -0,0 +1,39 @@
+import hashlib
+from typing import List
+
+import diskcache
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.embeddings.fastembed import FastEmbedEmbedding
+
+
+class CachedFastEmbedEmbedding(FastEmbedEmbedding):
+    """FastEmbed model that keeps chunk embeddings on disk, keyed on a hash of the model, embedding type and text.
+
+    Rebuilding the index then only embeds chunks that are new or changed.
+    """
+
+    _cache: diskcache.Cache = PrivateAttr()
+
+    def __init__(self, embedding_cache_dir: str = ".embed_cache", **kwargs):
+        """Open (or create) the on-disk vector cache and load the embedding model.
+
+        Other keyword arguments, including cache_dir for the downloaded model files, go to FastEmbedEmbedding.
+        """
+        super().__init__(**kwargs)
+        self._cache = diskcache.Cache(embedding_cache_dir)
+
+    def _cache_key(self, text: str) -> str:
+        """Hash the model name, embedding type and text, so a different model or type never returns stale vectors."""
+        return hashlib.sha256(f"{self.model_name}:{self.doc_embed_type}:{text}".encode()).hexdigest()
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """Return cached embeddings and compute only the misses, in one batch, keeping the input order."""
+        keys = [self._cache_key(text) for text in texts]
+        embeddings = [self._cache.get(key) for key in keys]
+        misses = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if misses:
+            computed = super()._get_text_embeddings([texts[i] for i in misses])
+            for i, embedding in zip(misses, computed):
+                self._cache.set(keys[i], embedding)
+                embeddings[i] = embedding
+        return embeddings
@@ -0,0 +1,122 @@
+import hashlib
+import sqlite3
+import threading
+from typing import Optional
+
+import faiss
+import numpy as np
+from fastembed import TextEmbedding
+
+
+class LLMResponseCache:
+    """SQLite-backed cache of LLM responses keyed on (namespace, model, temperature, prompt).
+
+    The namespace identifies whatever else the responses depend on (e.g. the indexed corpus),
+    so changing it leaves earlier entries unused.
+    """
+
+    def __init__(self, database_path: str = ".llm_cache.db", namespace: str = ""):
+        """Open (or create) the cache database."""
+        self.namespace = namespace
+        # Streamlit runs each session in its own thread, so share one connection behind a lock
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(database_path, check_same_thread=False)
+        with self.lock:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS llm_responses (key TEXT PRIMARY KEY, response TEXT NOT NULL)"
+            )
+            self.connection.commit()
+
+    def make_key(self, model: str, temperature: float, prompt: str) -> str:
+        """Hash the inputs that determine a (temperature 0) LLM response."""
+        return hashlib.sha256(f"{self.namespace}:{model}:{temperature}:{prompt}".encode()).hexdigest()
+
+    def get(self, model: str, temperature: float, prompt: str) -> Optional[str]:
+        """Return the cached response for the prompt, or None on a miss."""
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT response FROM llm_responses WHERE key = ?",
+                (self.make_key(model, temperature, prompt),),
+            ).fetchone()
+        return row[0] if row else None
+
+    def set(self, model: str, temperature: float, prompt: str, response: str):
+        """Store the response for the prompt."""
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO llm_responses (key, response) VALUES (?, ?)",
+                (self.make_key(model, temperature, prompt), response),
+            )
+            self.connection.commit()
+
+
+class SemanticQueryCache:
+    """Cache of LLM responses that also matches paraphrases of a previously seen prompt.
+
+    Entries live in memory in a FAISS inner-product index over normalised query embeddings
+    and are persisted to SQLite so they survive restarts. Only entries stored under the same
+    namespace (e.g. LLM model and indexed corpus) are matched.
+    """
+
+    def __init__(
+        self,
+        database_path: str = ".llm_cache.db",
+        model_name: str = "sentence-transformers/all-MiniLM-L6-v2",
+        similarity_threshold: float = 0.85,
+        namespace: str = "",
+    ):
+        """Open (or create) the cache database and load its entries into the FAISS index."""
+        self.similarity_threshold = similarity_threshold
+        self.namespace = namespace
+        self.embedding_model = TextEmbedding(model_name=model_name)
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(database_path, check_same_thread=False)
+        with self.lock:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS semantic_responses "
+                "(id INTEGER PRIMARY KEY, query TEXT NOT NULL, embedding BLOB NOT NULL, response TEXT NOT NULL, "
+                "namespace TEXT NOT NULL DEFAULT '')"
+            )
+            self.connection.commit()
+            rows = self.connection.execute(
+                "SELECT embedding, response FROM semantic_responses WHERE namespace = ? ORDER BY id",
+                (namespace,),
+            ).fetchall()
+
+        self.responses = [response for _, response in rows]
+        self.index = None
+        if rows:
+            embeddings = np.vstack([np.frombuffer(embedding, dtype="float32") for embedding, _ in rows])
+            self.index = faiss.IndexFlatIP(embeddings.shape[1])
+            self.index.add(embeddings)
+
+    def embed(self, query: str) -> np.ndarray:
+        """Embed the query as a normalised (1, dim) float32 array."""
+        embedding = np.array(list(self.embedding_model.embed([query])), dtype="float32")
+        faiss.normalize_L2(embedding)
+        return embedding
+
+    def get(self, query: str) -> Optional[str]:
+        """Return the response cached for the most similar query above the threshold, or None."""
+        embedding = self.embed(query)
+        with self.lock:
+            if self.index is None:
+                return None
+            scores, ids = self.index.search(embedding, 1)
+        if ids[0][0] < 0 or scores[0][0] < self.similarity_threshold:
+            return None
+        return self.responses[ids[0][0]]
+
+    def set(self, query: str, response: str):
+        """Store the response for the query."""
+        embedding = self.embed(query)
+        with self.lock:
+            if self.index is None:
+                self.index = faiss.IndexFlatIP(embedding.shape[1])
+            self.index.add(embedding)
+            self.responses.append(response)
+            self.connection.execute(
+                "INSERT INTO semantic_responses (query, embedding, response, namespace) VALUES (?, ?, ?, ?)",
+                (query, embedding.tobytes(), response, self.namespace),
+            )
+            self.connection.commit()
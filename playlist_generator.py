@@ -0,0 +1,326 @@
+import os
+import json
+import hashlib
+import faiss
+import functools
+from concurrent.futures import ThreadPoolExecutor
+import spotipy
+from spotipy.oauth2 import SpotifyClientCredentials, SpotifyOAuth
+from dotenv import load_dotenv
+from typing import Callable, Dict, Iterator, List, Optional
+from llama_index.core import (
+    Settings,
+    SimpleDirectoryReader,
+    StorageContext,
+    VectorStoreIndex,
+    load_index_from_storage,
+)
+from llama_index.llms.groq import Groq
+from llama_index.core.agent import ReActAgent
+from llama_index.core.tools import FunctionTool, QueryEngineTool, ToolMetadata
+from llama_index.core.memory import ChatMemoryBuffer
+from llama_index.core.node_parser import SentenceSplitter
+from llama_index.vector_stores.faiss import FaissVectorStore
+from embedding_cache import CachedFastEmbedEmbedding
+from llm_cache import LLMResponseCache, SemanticQueryCache
+
+# Load environment variables from .env file
+load_dotenv()
+
+# LLM settings; temperature 0 keeps responses deterministic so they can be cached
+LLM_MODEL = "llama3-70b-8192"
+LLM_TEMPERATURE = 0
+
+# Split documents into small chunks so retrieved nodes add fewer tokens to each LLM prompt
+CHUNK_SIZE = 512
+CHUNK_OVERLAP = 50
+
+# Embed chunks locally with FastEmbed (384-dim), in batches of 64; vectors of unchanged chunks
+# are reused from the on-disk embedding cache when the index is rebuilt
+EMBED_MODEL = "BAAI/bge-small-en-v1.5"
+EMBED_DIM = 384
+Settings.embed_model = CachedFastEmbedEmbedding(model_name=EMBED_MODEL, embed_batch_size=64)
+
+# File stored next to the persisted index recording the settings and source files it was built from
+MANIFEST_FILE = "manifest.json"
+
+# Spotify clients are built once so their token cache and HTTP connection pool are reused
+@functools.lru_cache(maxsize=1)
+def _get_sp() -> spotipy.Spotify:
+    """Return the shared Spotify client authorised for the user (scope: playlist-modify-private)."""
+    return spotipy.Spotify(auth_manager=SpotifyOAuth(
+        client_id=os.getenv("SPOTIPY_CLIENT_ID"),
+        client_secret=os.getenv("SPOTIPY_CLIENT_SECRET"),
+        redirect_uri=os.getenv("SPOTIPY_REDIRECT_URI"),
+        scope="playlist-modify-private"
+    ))
+
+
+@functools.lru_cache(maxsize=1)
+def _get_sp_readonly() -> spotipy.Spotify:
+    """Return the shared app-only Spotify client used for catalogue searches."""
+    return spotipy.Spotify(auth_manager=SpotifyClientCredentials(
+        client_id=os.getenv("SPOTIPY_CLIENT_ID"),
+        client_secret=os.getenv("SPOTIPY_CLIENT_SECRET")
+    ))
+
+
+# Spotify accepts at most 100 tracks per add-items request
+PLAYLIST_ADD_ITEMS_LIMIT = 100
+
+
+def _search_track(sp: spotipy.Spotify, song: str) -> Dict:
+    """Search for one song, trying a "<title> by <artist>" split first.
+
+    Titles can contain " by " themselves (e.g. "Stand by Me"), so a field-filtered search that
+    finds nothing falls back to searching the raw string.
+    """
+    parts = song.rsplit(" by ", 1)
+    if len(parts) == 2:
+        search_results = sp.search(q=f"track:{parts[0]} artist:{parts[1]}", type="track", limit=1)
+        if search_results['tracks']['items']:
+            return search_results
+    return sp.search(q=song, type="track", limit=1)
+
+
+# Function to create a Spotify playlist from already-resolved track URIs
+def create_spotify_playlist_from_uris(user_id: str, playlist_name: str, track_uris: List[str]) -> str:
+    """
+    Creates a Spotify playlist and adds the given tracks to it without searching for them.
+    
+    :param user_id: Spotify user ID
+    :param playlist_name: Name of the playlist to be created
+    :param track_uris: List of Spotify track URIs (spotify:track:<id>) to be added to the playlist
+    :return: The URL of the created playlist
+    """
+    sp = _get_sp()
+
+    # Create a new private playlist
+    playlist = sp.user_playlist_create(user_id, playlist_name, public=False)
+    playlist_id = playlist['id']
+
+    # Drop repeated tracks (keeping the first occurrence), including different labels that resolved to the same track
+    track_uris = list(dict.fromkeys(track_uris))
+
+    # Add tracks to the created playlist, in chunks of the add-items maximum
+    for start in range(0, len(track_uris), PLAYLIST_ADD_ITEMS_LIMIT):
+        sp.playlist_add_items(playlist_id, track_uris[start:start + PLAYLIST_ADD_ITEMS_LIMIT])
+
+    # Return the URL of the created playlist
+    return f"Your playlist has been created! [Open Playlist](https://open.spotify.com/playlist/{playlist_id})"
+
+
+# Function to create a Spotify playlist with the recommended songs
+def create_spotify_playlist(user_id: str, playlist_name: str, song_list: List[str]) -> str:
+    """
+    Creates a Spotify playlist and adds the song list to it.
+    
+    :param user_id: Spotify user ID
+    :param playlist_name: Name of the playlist to be created
+    :param song_list: List of song names (and artists) to be added to the playlist
+    :return: The URL of the created playlist
+    """
+    sp = _get_sp()
+
+    # Authorise on this thread first, so the search workers share one token instead of each starting the OAuth flow
+    sp.auth_manager.get_access_token(as_dict=False)
+
+    # Drop repeated songs (ignoring case and surrounding whitespace) so each is only searched once
+    seen = set()
+    unique_songs = []
+    for song in song_list:
+        key = song.strip().casefold()
+        if key not in seen:
+            seen.add(key)
+            unique_songs.append(song)
+
+    # Search for all songs concurrently (results keep the order of the songs) and get their URIs
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        search_results = executor.map(lambda song: _search_track(sp, song), unique_songs)
+    track_uris = [result['tracks']['items'][0]['uri'] for result in search_results if result['tracks']['items']]
+
+    return create_spotify_playlist_from_uris(user_id, playlist_name, track_uris)
+
+
+class PlaylistGeneratorWithLlamaIndex:
+    def __init__(self, data_path: str, index_path: str = "index"):
+        """Initialize with LlamaIndex and Spotify API."""
+        self.data_path = data_path
+        self.index_path = index_path
+        self.sp = _get_sp_readonly()
+
+        # Load or create the index with LlamaIndex
+        self.index = self.load_or_create_index()
+
+        # Refined queries depend on the LLM and on the indexed corpus, so cache them per (model, corpus)
+        cache_namespace = f"{LLM_MODEL}:{self.corpus_fingerprint()}"
+        self.llm_cache = LLMResponseCache(namespace=cache_namespace)
+        self.semantic_cache = SemanticQueryCache(namespace=cache_namespace)
+        
+        # Set up the LLM and the tools the agent uses to query the index
+        self.llm = Groq(model=LLM_MODEL, api_key=os.getenv("GROQ_API_KEY"), temperature=LLM_TEMPERATURE)
+        self.tools = self.create_tools()
+
+    def load_or_create_index(self):
+        """Load the persisted index, rebuilding it when the source files or index settings changed."""
+        manifest = self.build_manifest()
+        if os.path.exists(self.index_path) and self.load_manifest() == manifest:
+            return self.load_index()
+
+        # FAISS cannot delete vectors, so any change means rebuilding the whole index
+        index = self.create_index()
+        index.storage_context.persist(persist_dir=self.index_path)
+        self.save_manifest(manifest)
+        return index
+
+    def load_index(self):
+        """Load existing vector index."""
+        vector_store = FaissVectorStore.from_persist_dir(self.index_path)
+        storage_context = StorageContext.from_defaults(vector_store=vector_store, persist_dir=self.index_path)
+        return load_index_from_storage(storage_context, transformations=self.transformations())
+
+    def transformations(self):
+        """Return the node parsing pipeline applied to documents before they are embedded."""
+        return [SentenceSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)]
+
+    def load_documents(self):
+        """Read the source documents."""
+        documents = SimpleDirectoryReader(self.data_path).load_data()
+        if not documents:
+            raise ValueError("No documents found in the specified path.")
+        return documents
+
+    def create_index(self):
+        """Create a new FAISS-backed index from documents."""
+        # HNSW graph search over the 384-dim embeddings; for >100K vectors an IndexIVFPQ compresses better
+        faiss_index = faiss.IndexHNSWFlat(EMBED_DIM, 32)
+        storage_context = StorageContext.from_defaults(vector_store=FaissVectorStore(faiss_index=faiss_index))
+        return VectorStoreIndex.from_documents(
+            self.load_documents(), storage_context=storage_context, transformations=self.transformations()
+        )
+
+    def build_manifest(self) -> Dict:
+        """Describe the index settings and each source file's (mtime, size) so changes are detected without reading it."""
+        files = {}
+        for name in sorted(os.listdir(self.data_path)):
+            path = os.path.join(self.data_path, name)
+            if os.path.isfile(path):
+                stat = os.stat(path)
+                files[path] = [stat.st_mtime, stat.st_size]
+        settings = {"embed_model": EMBED_MODEL, "chunk_size": CHUNK_SIZE, "chunk_overlap": CHUNK_OVERLAP}
+        return {"settings": settings, "files": files}
+
+    def corpus_fingerprint(self) -> str:
+        """Hash the manifest, so anything that rebuilds the index also changes the fingerprint."""
+        return hashlib.sha256(json.dumps(self.build_manifest(), sort_keys=True).encode()).hexdigest()
+
+    def load_manifest(self) -> Dict:
+        """Return the manifest saved alongside the persisted index, if any."""
+        manifest_path = os.path.join(self.index_path, MANIFEST_FILE)
+        if not os.path.exists(manifest_path):
+            return {}
+        with open(manifest_path) as f:
+            return json.load(f)
+
+    def save_manifest(self, manifest: Dict):
+        """Save the manifest describing how and from which files the persisted index was built."""
+        with open(os.path.join(self.index_path, MANIFEST_FILE), "w") as f:
+            json.dump(manifest, f)
+
+    def create_tools(self):
+        """Create the tools the agent uses: a search over the index and Spotify song recommendations."""
+        query_engine = self.index.as_query_engine(llm=self.llm, similarity_top_k=3, response_mode="compact")
+
+        # Basic search tool
+        search_tool = QueryEngineTool(
+            query_engine=query_engine,
+            metadata=ToolMetadata(
+                name="document_search",
+                description="Search through a document corpus to refine song recommendations",
+            ),
+        )
+
+        # Custom tool to format song recommendations
+        song_recommendation_tool = FunctionTool.from_defaults(
+            fn=self.recommend_songs,
+            name="song_recommendations",
+            description="Fetches song recommendations from Spotify based on the filtered query"
+        )
+        return [search_tool, song_recommendation_tool]
+
+    def recommend_songs(self, query: str) -> List[Dict[str, str]]:
+        """Fetch Spotify recommendations based on filtered query, as {"label", "uri"} items."""
+        search_results = self.sp.search(q=query, type="track", limit=5)
+        tracks = search_results['tracks']['items']
+        return [
+            {"label": f"{track['name']} by {track['artists'][0]['name']}", "uri": track['uri']}
+            for track in tracks
+        ]
+
+    def create_agent(self):
+        """Create an agent over the shared tools, with its own empty chat memory."""
+        return ReActAgent.from_tools(
+            self.tools,
+            llm=self.llm,
+            verbose=True,
+            memory=ChatMemoryBuffer.from_defaults(token_limit=4096),
+        )
+
+    def get_cached_refined_query(self, user_query: str) -> Optional[str]:
+        """Return a cached refined query for the same or a similar description, or None."""
+        refined_query = self.llm_cache.get(LLM_MODEL, LLM_TEMPERATURE, user_query)
+        if refined_query is not None:
+            return refined_query
+
+        refined_query = self.semantic_cache.get(user_query)
+        if refined_query is not None:
+            self.llm_cache.set(LLM_MODEL, LLM_TEMPERATURE, user_query, refined_query)
+        return refined_query
+
+    def refine_query(self, user_query: str, write_stream: Optional[Callable[[Iterator[str]], str]] = None) -> str:
+        """Ask the agent to turn the user's description into a search query and cache the answer."""
+        # Each playlist request is independent, so it gets a fresh agent (and memory) instead of
+        # sharing one whose history other requests, or this one's late memory write, could leak into
+        response = self.create_agent().stream_chat(user_query)
+        
+        # Consume the answer tokens as they arrive; write_stream renders them and returns the full text
+        refined_query = (write_stream or "".join)(response.response_gen)
+        self.semantic_cache.set(user_query, refined_query)
+        self.llm_cache.set(LLM_MODEL, LLM_TEMPERATURE, user_query, refined_query)
+        return refined_query
+
+    def generate_playlist(
+        self, user_query: str, user_id: str, write_stream: Optional[Callable[[Iterator[str]], str]] = None
+    ) -> str:
+        """Generate a playlist based on the user's query and create it on Spotify.
+
+        If given, write_stream receives the refined query's tokens as the agent produces them.
+        """
+        search = self.recommend_songs
+        speculative = None
+        executor = ThreadPoolExecutor(max_workers=1)
+        try:
+            refined_query = self.get_cached_refined_query(user_query)
+            if refined_query is None:
+                # Search with the raw query while the agent works; the refined query is often unchanged
+                speculative = executor.submit(search, user_query)
+                refined_query = self.refine_query(user_query, write_stream)
+            elif write_stream is not None:
+                write_stream(iter([refined_query]))
+
+            # Fetch song recommendations based on the refined query, reusing the speculative search if it matches
+            if speculative is not None and refined_query.strip().casefold() == user_query.strip().casefold():
+                items = speculative.result()
+            else:
+                items = search(refined_query)
+        finally:
+            # Don't wait for an unused speculative search to finish
+            executor.shutdown(wait=False)
+        
+        if not items:
+            raise ValueError(f"No songs found for '{refined_query}'.")
+
+        # Create the Spotify playlist from the URIs the search already returned
+        playlist_url = create_spotify_playlist_from_uris(user_id, "Generated Playlist", [item["uri"] for item in items])
+        
+        return playlist_url